@@ -1,204 +1,434 @@
 import re
+import array
 import json
 import os
+import math
+import operator
+import argparse
+
+# Numba is optional; without it every expression runs as generated Python code
+try:
+    import numpy as np
+    from numba import njit
+except ImportError:
+    np = None
+    njit = None
+
+# Token type codes, in the same order as Tokenizer.token_patterns
+NUMBER, OPERATOR, PAREN, IDENTIFIER, ASSIGN = range(5)
+TOKEN_NAMES = ('NUMBER', 'OPERATOR', 'PAREN', 'IDENTIFIER', 'ASSIGN')
+
 # Tokenizer class
 class Tokenizer:
     token_patterns = {
-        'NUMBER': r'\d+(\.\d+)?',
+        'NUMBER': r'\d+(?:\.\d+)?',
         'OPERATOR': r'[+\-*/]',
         'PAREN': r'[()]',
         'IDENTIFIER': r'[a-zA-Z]\w*',
         'ASSIGN': r'='
     }
+    # Compiled once per process and shared by every instance
+    token_regex = re.compile('|'.join(f'(?P<{name}>{pattern})' for name, pattern in token_patterns.items()))
+    identifier_regex = re.compile(token_patterns['IDENTIFIER'])
 
-    def __init__(self):
-        self.token_regex = re.compile('|'.join(f'(?P<{name}>{pattern})' for name, pattern in self.token_patterns.items()))
-    
     def tokenize(self, input_string):
-        tokens = []
+        # Tokens are returned as parallel sequences: type codes and values.
+        # Each pattern is exactly one group, so lastindex - 1 is the type code
+        types = array.array('b')
+        values = []
+        types_append = types.append
+        values_append = values.append
         for match in self.token_regex.finditer(input_string):
-            token_type = match.lastgroup
-            token_value = match.group(token_type)
-            tokens.append((token_type, token_value))
-        return tokens
+            i = match.lastindex
+            types_append(i - 1)
+            values_append(match.group(i))
+        return types, values
 
-    def tokenize_to_file(self, input_string, filename):
-        tokens = self.tokenize(input_string)
+    def tokenize_to_file(self, input_string, filename, debug=False):
+        types, values = self.tokenize(input_string)
+        if not debug:
+            return types, values
         with open(filename, 'w') as file:
-            file.write(json.dumps(tokens))
-        return tokens
+            json.dump([(TOKEN_NAMES[t], v) for t, v in zip(types, values)], file, separators=(',', ':'))
+        return types, values
+
+_TOKENIZER = Tokenizer()
+
+# Output and operator stacks shared by every parse; cleared on entry so
+# their grown capacity is reused instead of reallocated per expression
+_OUT = []
+_OP_STACK = []
 
 # Parser class
 class Parser:
-    def __init__(self, tokens):
-        self.tokens = tokens
-        self.pos = 0
-        self.error = None
-    
-    def peek(self):
-        if self.pos < len(self.tokens):
-            return self.tokens[self.pos]
-        return None
-    
-    def consume(self):
-        self.pos += 1
-    
-    def parse_expression(self):
+    precedence = {'+': 1, '-': 1, '*': 2, '/': 2}
+
+    # Parsing keeps no per-expression state, so no Parser object is built
+    @classmethod
+    def parse(cls, tokens, symbol_table):
+        # Iterative shunting-yard producing postfix (RPN) nodes in out; ops
+        # holds pending operators and open parentheses. Returns (rpn, error)
+        # with rpn as a tuple
+        types, values = tokens
+        n = len(types)
+        precedence = cls.precedence
+        intern = symbol_table.intern
+        out = _OUT
+        ops = _OP_STACK
+        out.clear()
+        ops.clear()
+        expect_operand = True
+        i = 0
         try:
-            node = self.parse_term()
-            while self.peek() and self.peek()[1] in '+-':
-                token = self.peek()
-                self.consume()
-                right = self.parse_term()
-                node = ('bin_op', token[1], node, right)
-            return node
+            while i < n:
+                kind = types[i]
+                value = values[i]
+                i += 1
+                if expect_operand:
+                    if kind == NUMBER:
+                        out.append(('number', float(value)))
+                    elif kind == IDENTIFIER:
+                        out.append(('identifier_idx', intern(value)))
+                    elif value == '(':
+                        ops.append('(')
+                        continue
+                    else:
+                        raise SyntaxError(f"Unexpected token: {(TOKEN_NAMES[kind], value)}")
+                    expect_operand = False
+                elif kind == OPERATOR:
+                    prec = precedence[value]
+                    while ops and ops[-1] != '(' and precedence[ops[-1]] >= prec:
+                        out.append(('bin_op', ops.pop()))
+                    ops.append(value)
+                    expect_operand = True
+                elif value == ')':
+                    while ops and ops[-1] != '(':
+                        out.append(('bin_op', ops.pop()))
+                    if not ops:
+                        raise SyntaxError("Unmatched parenthesis")
+                    ops.pop()
+                else:
+                    raise SyntaxError(f"Unexpected token: {(TOKEN_NAMES[kind], value)}")
+            if expect_operand:
+                raise SyntaxError("Unexpected end of input")
+            while ops:
+                op = ops.pop()
+                if op == '(':
+                    raise SyntaxError("Unmatched parenthesis")
+                out.append(('bin_op', op))
+            return tuple(out), None
         except SyntaxError as se:
-            self.error = str(se)
-            return None
-    
-    def parse_term(self):
-        node = self.parse_factor()
-        while self.peek() and self.peek()[1] in '*/':
-            token = self.peek()
-            self.consume()
-            right = self.parse_factor()
-            node = ('bin_op', token[1], node, right)
-        return node
-    
-    def parse_factor(self):
-        token = self.peek()
-        if token[0] == 'NUMBER':
-            self.consume()
-            return ('number', token[1])
-        elif token[0] == 'IDENTIFIER':
-            self.consume()
-            return ('identifier', token[1])
-        elif token[1] == '(':
-            self.consume()
-            expr = self.parse_expression()
-            if self.peek() and self.peek()[1] == ')':
-                self.consume()
-                return expr
-            else:
-                raise SyntaxError("Unmatched parenthesis")
-        else:
-            raise SyntaxError(f"Unexpected token: {token}")
+            return None, str(se)
 
-    def parse_to_file(self, filename):
-        parse_tree = self.parse_expression()
-        if self.error:
+    @classmethod
+    def parse_to_file(cls, tokens, symbol_table, filename, debug=False):
+        parse_tree, error = cls.parse(tokens, symbol_table)
+        if not debug:
+            return parse_tree, error
+        if error:
             with open(filename, 'w') as file:
-                file.write(f"Error: {self.error}\n")
-            return None
+                file.write(f"Error: {error}\n")
+            return None, error
         else:
+            # Show variable names rather than internal symbol table slots
+            names = symbol_table.names
+            readable = [('identifier', names[node[1]]) if node[0] == 'identifier_idx' else node
+                        for node in parse_tree]
             with open(filename, 'w') as file:
-                file.write(json.dumps(parse_tree))
-            return parse_tree
+                json.dump(readable, file, separators=(',', ':'))
+            return parse_tree, None
 
 # Symbol Table class
 class SymbolTable:
+    # First line of the key=value file format; files without it are legacy JSON
+    format_header = '#symtab v1'
+    parse_cache_size = 4096
+
     def __init__(self, filename):
         self.filename = filename
         self.table = {}
+        # Interned variables: name -> slot in values (NaN until assigned)
+        self.index = {}
+        self.names = []
+        self.values = array.array('d')
+        # Parses depend on this table's slots, so each table keeps its own
+        # cache, keyed by expression string and freed together with the table
+        self.parse_cache = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.dirty = False
         self.load()
     
     def load(self):
         if os.path.exists(self.filename):
             with open(self.filename, 'r') as file:
-                self.table = json.load(file)
+                content = file.read()
+            if content.startswith('{'):
+                self.table = json.loads(content)
+            elif content:
+                lines = content.splitlines()
+                if lines[0] != self.format_header:
+                    raise ValueError(f"Unrecognized symbol table format in {self.filename}")
+                self.table = {}
+                for line in lines[1:]:
+                    if not line:
+                        continue
+                    # A line without '=' leaves value empty, which float() rejects
+                    variable, _, value = line.partition('=')
+                    try:
+                        self.table[variable] = float(value)
+                    except ValueError:
+                        raise ValueError(f"Unrecognized symbol table format in {self.filename}") from None
+            for variable, value in self.table.items():
+                self.values[self.intern(variable)] = value
     
     def save(self):
-        with open(self.filename, 'w') as file:
-            json.dump(self.table, file)
+        # Write a temporary file and rename it over the old one, so a crash
+        # mid-write never leaves a truncated symbol table behind
+        temp_filename = self.filename + '.tmp'
+        with open(temp_filename, 'w', buffering=1 << 16) as file:
+            file.write('\n'.join([self.format_header] + [f'{k}={v!r}' for k, v in self.table.items()]))
+        os.replace(temp_filename, self.filename)
+        self.dirty = False
+
+    def flush(self):
+        # Assignments only mark the table dirty; write it out once here
+        if self.dirty:
+            self.save()
+    
+    def intern(self, variable):
+        slot = self.index.get(variable)
+        if slot is None:
+            slot = self.index[variable] = len(self.names)
+            self.names.append(variable)
+            self.values.append(math.nan)
+        return slot
+
+    def parse(self, input_string):
+        # Returns (rpn, error, evaluator); the evaluator is compiled here so a
+        # cached parse never needs another lookup to find it
+        rpn, error = Parser.parse(_TOKENIZER.tokenize(input_string), self)
+        return rpn, error, (compile_evaluator(rpn) if error is None else None)
+
+    def cached_parse(self, input_string):
+        cache = self.parse_cache
+        entry = cache.pop(input_string, None)
+        if entry is None:
+            self.cache_misses += 1
+            entry = self.parse(input_string)
+            if len(cache) >= self.parse_cache_size:
+                # Entries are reinserted on use, so the first key is the least recently used
+                del cache[next(iter(cache))]
+        else:
+            self.cache_hits += 1
+        cache[input_string] = entry
+        return entry
+
+    def is_defined(self, slot):
+        return self.names[slot] in self.table
     
     def set(self, variable, value):
         self.table[variable] = value
-        self.save()
+        self.values[self.intern(variable)] = value
+        self.dirty = True
     
     def get(self, variable):
         return self.table.get(variable, None)
 
 # Evaluation Engine
-def evaluate(node, symbol_table):
-    if node[0] == 'number':
-        return float(node[1])
-    elif node[0] == 'identifier':
-        value = symbol_table.get(node[1])
-        if value is None:
-            raise NameError(f"Undefined variable: {node[1]}")
-        return value
-    elif node[0] == 'bin_op':
-        left_val = evaluate(node[2], symbol_table)
-        right_val = evaluate(node[3], symbol_table)
-        if node[1] == '+':
-            return left_val + right_val
-        elif node[1] == '-':
-            return left_val - right_val
-        elif node[1] == '*':
-            return left_val * right_val
-        elif node[1] == '/':
-            return left_val / right_val
+_OPS = {'+': operator.add, '-': operator.sub, '*': operator.mul, '/': operator.truediv}
+
+# Opcodes of the compiled form of an RPN parse
+OP_NUMBER, OP_VAR, OP_ADD, OP_SUB, OP_MUL, OP_DIV = range(6)
+BIN_OPCODES = {'+': OP_ADD, '-': OP_SUB, '*': OP_MUL, '/': OP_DIV}
+
+# Parses with at least this many RPN nodes run on the Numba stack machine;
+# below that the generated Python code is faster (measured break-even ~64)
+NUMBA_MIN_NODES = 64
+
+def compile_ast(rpn):
+    # Encode an RPN parse as opcode/operand arrays plus the symbol slots it
+    # reads and the stack depth it needs
+    opcodes = []
+    operands = []
+    slots = []
+    height = depth = 0
+    for node in rpn:
+        if node[0] == 'number':
+            opcodes.append(OP_NUMBER)
+            operands.append(node[1])
+            height += 1
+        elif node[0] == 'identifier_idx':
+            if node[1] not in slots:
+                slots.append(node[1])
+            opcodes.append(OP_VAR)
+            operands.append(node[1])
+            height += 1
+        else:
+            opcodes.append(BIN_OPCODES[node[1]])
+            operands.append(0.0)
+            height -= 1
+        depth = max(depth, height)
+    return (np.array(opcodes, dtype=np.int32), np.array(operands, dtype=np.float64),
+            tuple(slots), depth)
+
+if njit is not None:
+    @njit(cache=True)
+    def eval_rpn(opcodes, operands, symbols, depth):
+        stack = np.empty(depth, dtype=np.float64)
+        top = 0
+        for i in range(opcodes.shape[0]):
+            op = opcodes[i]
+            if op == OP_NUMBER:
+                stack[top] = operands[i]
+                top += 1
+            elif op == OP_VAR:
+                stack[top] = symbols[int(operands[i])]
+                top += 1
+            else:
+                top -= 1
+                right_val = stack[top]
+                left_val = stack[top - 1]
+                if op == OP_ADD:
+                    stack[top - 1] = left_val + right_val
+                elif op == OP_SUB:
+                    stack[top - 1] = left_val - right_val
+                elif op == OP_MUL:
+                    stack[top - 1] = left_val * right_val
+                else:
+                    if right_val == 0.0:
+                        raise ZeroDivisionError("float division by zero")
+                    stack[top - 1] = left_val / right_val
+        return stack[0]
+else:
+    eval_rpn = None
+
+def _check_defined(symbol_table, slots):
+    # Unassigned slots hold NaN; only then is the name lookup needed
+    values = symbol_table.values
+    for slot in slots:
+        if values[slot] != values[slot] and not symbol_table.is_defined(slot):
+            raise NameError(f"Undefined variable: {symbol_table.names[slot]}")
+
+def compile_evaluator(rpn):
+    # Build evaluator(symbol_table) for an RPN parse, once per parse
+    if eval_rpn is not None and len(rpn) >= NUMBA_MIN_NODES:
+        opcodes, operands, slots, depth = compile_ast(rpn)
+
+        def evaluator(symbol_table):
+            _check_defined(symbol_table, slots)
+            # Zero-copy view of the symbol values. It must be released even
+            # when eval_rpn raises: while it exists the array cannot grow,
+            # and a traceback would otherwise keep it alive
+            symbols = np.frombuffer(symbol_table.values, dtype=np.float64)
+            try:
+                return float(eval_rpn(opcodes, operands, symbols, depth))
+            finally:
+                del symbols
+        return evaluator
+
+    # Generate flat Python code (one temporary per operator, constants
+    # folded) reading variables straight from the symbol table's values
+    def source(item):
+        return repr(item) if isinstance(item, float) else item
+
+    stack = []
+    slots = []
+    lines = ['def expression(v):']
+    for node in rpn:
+        if node[0] == 'number':
+            stack.append(node[1])
+        elif node[0] == 'identifier_idx':
+            if node[1] not in slots:
+                slots.append(node[1])
+            stack.append(f'v[{node[1]}]')
+        else:
+            right = stack.pop()
+            left = stack.pop()
+            # Division by a zero constant is left for run time to report
+            if isinstance(left, float) and isinstance(right, float) and not (node[1] == '/' and right == 0.0):
+                stack.append(_OPS[node[1]](left, right))
+            else:
+                temp = f't{len(lines)}'
+                lines.append(f'    {temp} = {source(left)} {node[1]} {source(right)}')
+                stack.append(temp)
+    lines.append(f'    return {source(stack[0])}')
+    namespace = {'__builtins__': {}, 'inf': math.inf, 'nan': math.nan}
+    exec(compile('\n'.join(lines), '<expr>', 'exec'), namespace)
+    function = namespace['expression']
+
+    def evaluator(symbol_table):
+        _check_defined(symbol_table, slots)
+        return function(symbol_table.values)
+    return evaluator
 
 # Main Program
-def process_expression(input_string, tokenizer, symbol_table):
+def write_error(filename, message, debug=False):
+    # Error reports are debug artifacts like tokens.txt and parse_tree.txt
+    if debug:
+        with open(filename, 'w') as file:
+            file.write(message)
+
+def process_expression(input_string, tokenizer, symbol_table, debug=False):
     tokens_file = "tokens.txt"
     parse_tree_file = "parse_tree.txt"
     error_file = "error.txt"
 
-    # Tokenize the input
+    # Only the first '=' makes an assignment; the rest is its expression
+    variable, sep, expression = input_string.partition('=')
+    if sep:
+        variable = variable.strip()
+        if not tokenizer.identifier_regex.fullmatch(variable):
+            write_error(error_file, "Error: Invalid assignment target\n", debug)
+            return "Parsing error: Invalid assignment target"
+    else:
+        expression = variable
+
+    if debug:
+        # Debug runs skip the caches so that every side file gets written.
+        # tokens.txt records the whole input; only the part after the
+        # first ASSIGN token is parsed
+        try:
+            tokens = tokenizer.tokenize_to_file(input_string, tokens_file, debug)
+        except Exception as e:
+            print(f"Tokenization error: {e}")
+            return f"Tokenization error: {e}"
+        if sep:
+            types, values = tokens
+            start = types.index(ASSIGN) + 1
+            tokens = (types[start:], values[start:])
+        parse_tree, error = Parser.parse_to_file(tokens, symbol_table, parse_tree_file, debug)
+        evaluator = compile_evaluator(parse_tree) if error is None else None
+    else:
+        try:
+            parse_tree, error, evaluator = symbol_table.cached_parse(expression)
+        except Exception as e:
+            print(f"Tokenization error: {e}")
+            return f"Tokenization error: {e}"
+
+    if error:
+        write_error(error_file, f"Error: {error}\n", debug)
+        return f"Parsing error: {error}"
+
+    # Evaluate the expression
     try:
-        tokens = tokenizer.tokenize_to_file(input_string, tokens_file)
+        value = evaluator(symbol_table)
     except Exception as e:
-        print(f"Tokenization error: {e}")
-        return f"Tokenization error: {e}"
-
-    # Check for assignment
-    if '=' in input_string:
-        parts = input_string.split('=')
-        variable = parts[0].strip()
-        expression = parts[1].strip()
-        tokens = tokenizer.tokenize(expression)
-        # Evaluate the expression and store the variable
-        parser = Parser(tokens)
-        parse_tree = parser.parse_expression()
-        if parse_tree and not parser.error:
-            try:
-                value = evaluate(parse_tree, symbol_table)
-                symbol_table.set(variable, value)
-                return f"{variable} = {value}"
-            except Exception as e:
-                with open(error_file, 'w') as file:
-                    file.write(f"Evaluation error: {e}\n")
-                return f"Evaluation error: {e}"
-        else:
-            with open(error_file, 'w') as file:
-                file.write(f"Error: {parser.error}\n")
-            return f"Parsing error: {parser.error}"
-    else:
-        # Parse the tokens
-        parser = Parser(tokens)
-        parse_tree = parser.parse_to_file(parse_tree_file)
-        if parser.error:
-            with open(error_file, 'w') as file:
-                file.write(f"Error: {parser.error}\n")
-            return f"Parsing error: {parser.error}"
-        else:
-            # Evaluate the expression
-            try:
-                result = evaluate(parse_tree, symbol_table)
-                return f"Result: {result}"
-            except Exception as e:
-                with open(error_file, 'w') as file:
-                    file.write(f"Evaluation error: {e}\n")
-                return f"Evaluation error: {e}"
-
-def main():
+        write_error(error_file, f"Evaluation error: {e}\n", debug)
+        return f"Evaluation error: {e}"
+    if sep:
+        # Store the variable
+        symbol_table.set(variable, value)
+        return f"{variable} = {value}"
+    return f"Result: {value}"
+
+def main(debug=False):
     # Setup file names
     symbol_table_file = "symbol_table.txt"
     output_file = "results.txt"
 
     # Initialize classes
-    tokenizer = Tokenizer()
+    tokenizer = _TOKENIZER
     symbol_table = SymbolTable(symbol_table_file)
 
     while True:
@@ -211,30 +441,46 @@ def main():
 
         if input_source == '1':
             input_string = input("Enter the expression: ")
-            result = process_expression(input_string, tokenizer, symbol_table)
+            result = process_expression(input_string, tokenizer, symbol_table, debug)
+            symbol_table.flush()
             print(result)
         elif input_source == '2':
             input_filename = input("Enter the input file name: ")
             try:
-                with open(input_filename, 'r') as infile:
-                    expressions = infile.readlines()
-                
-                with open(output_file, 'w') as outfile:
-                    for expression in expressions:
+                # Stream the input and write results in batches of 64 lines to a
+                # temporary file, renamed over the output once the input is
+                # consumed (the input may itself be the output file)
+                temp_output_file = output_file + '.tmp'
+                with open(input_filename, 'r', buffering=1 << 16) as infile, \
+                        open(temp_output_file, 'w', buffering=1 << 16) as outfile:
+                    batch = []
+                    for expression in infile:
                         expression = expression.strip()
                         if expression:
                             print(f"Processing: {expression}")
-                            result = process_expression(expression, tokenizer, symbol_table)
+                            result = process_expression(expression, tokenizer, symbol_table, debug)
                             print(result)
-                            outfile.write(f"{expression}: {result}\n")
+                            batch.append(f"{expression}: {result}\n")
+                            if len(batch) == 64:
+                                outfile.write(''.join(batch))
+                                batch.clear()
+                    outfile.write(''.join(batch))
+                os.replace(temp_output_file, output_file)
+                symbol_table.flush()
                 print(f"Results have been written to {output_file}")
             except FileNotFoundError:
                 print("File not found.")
         elif input_source == '3':
+            lookups = symbol_table.cache_hits + symbol_table.cache_misses
+            if lookups:
+                print(f"Parse cache hit ratio: {symbol_table.cache_hits}/{lookups} ({symbol_table.cache_hits / lookups:.0%})")
             print("Exiting...")
             break
         else:
             print("Invalid input source.")
 
 if __name__ == "__main__":
-    main()
+    arg_parser = argparse.ArgumentParser(description="Advanced calculator with variable storage")
+    arg_parser.add_argument('--debug', action='store_true',
+                            help="write tokens.txt, parse_tree.txt and error.txt for each expression")
+    main(debug=arg_parser.parse_args().debug)